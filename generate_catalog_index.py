@@ -2,14 +2,32 @@
 """
 Extract text from OCR PDFs and generate structured JSON catalog index.
 Processes all ocr_trim_page_*.pdf files and creates catalog_index.json and section_index.json
+
+Requires pypdfium2 for text extraction. pyahocorasick and orjson are used
+for keyword matching and JSON output when installed.
 """
 
+import heapq
 import json
 import os
 import re
-import subprocess
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
-from collections import defaultdict
+from itertools import groupby
+
+import pypdfium2 as pdfium
+
+try:
+    import ahocorasick
+except ImportError:  # pyahocorasick is optional; fall back to substring scans
+    ahocorasick = None
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the json module
+    orjson = None
 
 # Section mapping based on catalog TOC
 SECTION_MAPPING = [
@@ -27,54 +45,158 @@ SECTION_MAPPING = [
     ("Safety_Equipment_Supplies", 247, 298),
 ]
 
-def get_section_info(page_num):
-    """Determine section name and page range group for a given page number."""
+# Precompiled regex patterns used on every page
+_WS_RE = re.compile(r'\s+')
+_INLINE_WS_RE = re.compile(r'[^\S\n]+')
+_PAGE_NUM_RE = re.compile(r'ocr_trim_page_(\d+)\.pdf')
+_WORD_RE = re.compile(r'\b[a-z]{4,}\b')
+
+# Common non-title patterns and table headers, matched against line.upper()
+_TITLE_SKIP_RE = re.compile(r'CAT #|PART NO|SKU|DESCRIPTION|QTY|BOX')
+_TABLE_HEADER_RE = re.compile(r'CAT #|PART NO|SKU|DESCRIPTION|QTY|SIZE')
+
+# Patterns to identify products
+_PRODUCT_PATTERNS = (
+    re.compile(r'([A-Z][A-Za-z0-9\s\-&/]+(?:Gun|Nailer|Drill|Saw|Tool|Anchor|Fastener|Bit|System|Kit|Set))'),
+    re.compile(r'([A-Z][A-Z\s]{5,})'),  # Multiple uppercase words
+    re.compile(r'([A-Z0-9\-]{4,}[A-Z0-9])'),  # Model numbers
+)
+
+# Common tool/product terms
+COMMON_TERMS = [
+    'drill', 'saw', 'nailer', 'hammer', 'wrench', 'pliers', 'screwdriver',
+    'anchor', 'fastener', 'bolt', 'screw', 'nail', 'pin', 'rivet',
+    'cordless', 'electric', 'pneumatic', 'manual', 'power tool',
+    'concrete', 'steel', 'wood', 'metal', 'plastic',
+    'safety', 'protective', 'gloves', 'glasses', 'mask',
+    'measuring', 'tape', 'level', 'square',
+    'ladder', 'scaffold', 'platform',
+    'cleaning', 'supplies', 'chemical',
+    'storage', 'box', 'cabinet', 'cart',
+    'dewalt', 'milwaukee', 'hilti', 'stanley', 'red head'
+]
+
+# Content-type markers used by generate_summary, as bits of a mask
+SPEC_BIT = 1
+ACCESSORIES_BIT = 2
+LISTING_BIT = 4
+APPLICATION_BIT = 8
+
+CONTENT_MARKERS = {
+    'specifications': SPEC_BIT, 'spec': SPEC_BIT,
+    'accessories': ACCESSORIES_BIT,
+    'model': LISTING_BIT, 'cat #': LISTING_BIT,
+    'application': APPLICATION_BIT, 'use': APPLICATION_BIT,
+}
+
+CONTENT_TYPES = (
+    (SPEC_BIT, "specifications"),
+    (ACCESSORIES_BIT, "accessories"),
+    (LISTING_BIT, "product listings"),
+    (APPLICATION_BIT, "application details"),
+)
+
+def _build_term_automaton():
+    """Build an Aho-Corasick automaton matching all terms and markers in one pass."""
+    # Each word maps to (common term or None, content-type bits)
+    words = {term: (term, 0) for term in COMMON_TERMS}
+    for marker, bit in CONTENT_MARKERS.items():
+        term, mask = words.get(marker, (None, 0))
+        words[marker] = (term, mask | bit)
+    
+    automaton = ahocorasick.Automaton()
+    for word, value in words.items():
+        automaton.add_word(word, value)
+    automaton.make_automaton()
+    return automaton
+
+_TERM_AUTOMATON = _build_term_automaton() if ahocorasick else None
+
+def scan_terms(text_lower):
+    """Find common terms and the content-type mask of lowercased text."""
+    if _TERM_AUTOMATON is not None:
+        terms = set()
+        content_mask = 0
+        for _, (term, bit) in _TERM_AUTOMATON.iter(text_lower):
+            if term is not None:
+                terms.add(term)
+            content_mask |= bit
+        return terms, content_mask
+    
+    terms = {term for term in COMMON_TERMS if term in text_lower}
+    content_mask = 0
+    for marker, bit in CONTENT_MARKERS.items():
+        if not content_mask & bit and marker in text_lower:
+            content_mask |= bit
+    return terms, content_mask
+
+def _build_page_to_section():
+    """Precompute the (section, page range group) pair for every catalog page."""
+    table = [None] * (max(end for _, _, end in SECTION_MAPPING) + 1)
+    range_groups = {}
     for section_name, start, end in SECTION_MAPPING:
-        if start <= page_num <= end:
-            # Format section name with proper spacing
-            display_name = section_name.replace("_", " ")
+        # Format section name with proper spacing
+        display_name = sys.intern(section_name.replace("_", " "))
+        for page_num in range(start, end + 1):
+            if table[page_num] is not None:
+                continue
             # Create page range group (groups of 10)
             range_start = (page_num // 10) * 10
-            range_end = range_start + 9
-            page_range = f"Pages {range_start}–{range_end}"
-            return display_name, page_range
+            if range_start not in range_groups:
+                range_groups[range_start] = sys.intern(f"Pages {range_start}–{range_start + 9}")
+            table[page_num] = (display_name, range_groups[range_start])
+    return table
+
+_PAGE_TO_SECTION = _build_page_to_section()
+
+def get_section_info(page_num):
+    """Determine section name and page range group for a given page number."""
+    if 0 <= page_num < len(_PAGE_TO_SECTION) and _PAGE_TO_SECTION[page_num] is not None:
+        return _PAGE_TO_SECTION[page_num]
     return "Unknown", "Unknown"
 
 def extract_text_from_pdf(pdf_path):
-    """Extract text from PDF using pdftotext."""
+    """Extract text from PDF in-process using pypdfium2."""
     try:
-        result = subprocess.run(
-            ['pdftotext', '-layout', pdf_path, '-'],
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        return result.stdout
-    except subprocess.CalledProcessError as e:
+        pdf = pdfium.PdfDocument(pdf_path)
+    except pdfium.PdfiumError as e:
         print(f"Error extracting text from {pdf_path}: {e}")
         return ""
+    try:
+        return "\n".join(page.get_textpage().get_text_range() for page in pdf)
+    finally:
+        pdf.close()
 
 def clean_text(text):
     """Clean and normalize extracted text."""
-    # Remove excessive whitespace
-    text = re.sub(r'\s+', ' ', text)
-    # Remove special characters that interfere with parsing
-    text = text.replace('\x0c', ' ')  # form feed
+    # Remove excessive whitespace but keep line breaks for title/product
+    # detection; this also replaces form feeds and carriage returns
+    text = _INLINE_WS_RE.sub(' ', text)
     return text.strip()
 
-def extract_title(text, page_num):
-    """Generate a human-friendly page title from the text."""
-    lines = [line.strip() for line in text.split('\n') if line.strip()]
-    
-    # Look for major headings (uppercase text, longer than 5 chars)
-    headings = []
-    for line in lines[:30]:  # Check first 30 lines
-        # Check if line is mostly uppercase and significant length
-        if len(line) > 5 and sum(c.isupper() for c in line if c.isalpha()) / max(len([c for c in line if c.isalpha()]), 1) > 0.6:
-            # Skip common non-title patterns
-            if not any(skip in line.upper() for skip in ['CAT #', 'PART NO', 'SKU', 'DESCRIPTION', 'QTY', 'BOX']):
-                headings.append(line.strip())
-    
+@dataclass
+class PageAnalysis:
+    """Title, products, keywords and summary hints gathered from one page."""
+    title: str
+    products: list
+    keywords: list
+    summary_hints: int
+
+def is_heading(line):
+    """Check if a stripped line looks like a major heading (mostly uppercase)."""
+    if len(line) <= 5:
+        return False
+    # Single pass over characters
+    upper = alpha = 0
+    for c in line:
+        if c.isalpha():
+            alpha += 1
+            if c.isupper():
+                upper += 1
+    return alpha > 0 and upper / alpha > 0.6
+
+def format_title(headings, fallback, page_num):
+    """Generate a human-friendly page title from detected headings."""
     if headings:
         # Take first 1-2 major headings
         title = " – ".join(headings[:2])
@@ -83,87 +205,83 @@ def extract_title(text, page_num):
             title = title[:77] + "..."
         return title
     
-    # Fallback: use first substantial line
-    for line in lines[:20]:
-        if len(line) > 10 and not line.startswith('CAT'):
-            return line[:80]
+    # Fallback: first substantial line
+    if fallback:
+        return fallback
     
     # Last resort
     section, _ = get_section_info(page_num)
     return f"{section} – Page {page_num}"
 
-def extract_products(text):
-    """Extract product names, model numbers, and major items."""
+def add_products(line, products, seen):
+    """Append product names and model numbers found in a line."""
+    for pattern in _PRODUCT_PATTERNS:
+        for match in pattern.findall(line):
+            match = match.strip()
+            if len(match) > 4 and len(match) < 60:
+                # Clean up
+                match = _WS_RE.sub(' ', match)
+                if match not in seen:
+                    seen.add(match)
+                    products.append(match)
+
+def analyze_page(text, page_num):
+    """Extract title, products, keywords and summary hints in one pass over the lines."""
+    headings = []
+    fallback = None
     products = []
-    lines = text.split('\n')
-    
-    # Patterns to identify products
-    product_patterns = [
-        r'([A-Z][A-Za-z0-9\s\-&/]+(?:Gun|Nailer|Drill|Saw|Tool|Anchor|Fastener|Bit|System|Kit|Set))',
-        r'([A-Z][A-Z\s]{5,})',  # Multiple uppercase words
-        r'([A-Z0-9\-]{4,}[A-Z0-9])',  # Model numbers
-    ]
-    
-    for line in lines[:50]:  # Focus on first part of page
+    seen = set()
+    nonblank = 0
+    
+    for i, line in enumerate(text.split('\n')):
+        # Titles use the first 30 non-blank lines (or the first 2 headings),
+        # products the first 50 lines
+        title_done = nonblank >= 30 or len(headings) >= 2
+        if i >= 50 and title_done:
+            break
         line = line.strip()
-        if not line or len(line) < 4:
-            continue
-            
-        # Skip table headers
-        if any(header in line.upper() for header in ['CAT #', 'PART NO', 'SKU', 'DESCRIPTION', 'QTY', 'SIZE']):
+        if not line:
             continue
+        upper = line.upper()
+        
+        if not title_done:
+            # Look for major headings, skipping common non-title patterns
+            if is_heading(line) and not _TITLE_SKIP_RE.search(upper):
+                headings.append(line)
+            if fallback is None and nonblank < 20 and len(line) > 10 and not line.startswith('CAT'):
+                fallback = line[:80]
+            nonblank += 1
         
-        for pattern in product_patterns:
-            matches = re.findall(pattern, line)
-            for match in matches:
-                match = match.strip()
-                if len(match) > 4 and len(match) < 60:
-                    # Clean up
-                    match = re.sub(r'\s+', ' ', match)
-                    if match not in products:
-                        products.append(match)
+        # Skip short lines and table headers
+        if i < 50 and len(line) >= 4 and not _TABLE_HEADER_RE.search(upper):
+            add_products(line, products, seen)
     
+    title = format_title(headings, fallback, page_num)
     # Limit to top 10 most relevant
-    return products[:10]
-
-def extract_keywords(text, title, products):
-    """Extract relevant keywords from text."""
-    keywords = set()
-    
-    # Convert to lowercase for analysis
-    text_lower = text.lower()
-    
-    # Common tool/product terms
-    common_terms = [
-        'drill', 'saw', 'nailer', 'hammer', 'wrench', 'pliers', 'screwdriver',
-        'anchor', 'fastener', 'bolt', 'screw', 'nail', 'pin', 'rivet',
-        'cordless', 'electric', 'pneumatic', 'manual', 'power tool',
-        'concrete', 'steel', 'wood', 'metal', 'plastic',
-        'safety', 'protective', 'gloves', 'glasses', 'mask',
-        'measuring', 'tape', 'level', 'square',
-        'ladder', 'scaffold', 'platform',
-        'cleaning', 'supplies', 'chemical',
-        'storage', 'box', 'cabinet', 'cart',
-        'dewalt', 'milwaukee', 'hilti', 'stanley', 'red head'
-    ]
-    
-    # Find terms in text
-    for term in common_terms:
-        if term in text_lower:
-            keywords.add(term)
+    products = products[:10]
+    
+    # One scan finds both the common terms and the content-type markers
+    terms, summary_hints = scan_terms(text.lower())
+    keywords = extract_keywords(terms, title, products)
+    
+    return PageAnalysis(title, products, keywords, summary_hints)
+
+def extract_keywords(terms, title, products):
+    """Extract relevant keywords from the page's common terms, title and products."""
+    keywords = set(terms)
     
     # Extract from title
-    title_words = re.findall(r'\b[a-z]{4,}\b', title.lower())
+    title_words = _WORD_RE.findall(title.lower())
     keywords.update(word for word in title_words if word not in ['page', 'pages', 'catalog'])
     
     # Extract from products
     for product in products:
-        product_words = re.findall(r'\b[a-z]{4,}\b', product.lower())
+        product_words = _WORD_RE.findall(product.lower())
         keywords.update(product_words[:3])  # Limit per product
     
-    return sorted(list(keywords))[:15]  # Limit to 15 keywords
+    return heapq.nsmallest(15, keywords)  # Limit to 15 keywords
 
-def generate_summary(text, title, products):
+def generate_summary(products, content_mask):
     """Generate a 1-2 sentence summary of the page."""
     section_info = ""
     if products:
@@ -174,18 +292,7 @@ def generate_summary(text, title, products):
         section_info = f"Features {product_list}. "
     
     # Analyze content type
-    text_lower = text.lower()
-    content_type = []
-    
-    if 'specifications' in text_lower or 'spec' in text_lower:
-        content_type.append("specifications")
-    if 'accessories' in text_lower:
-        content_type.append("accessories")
-    if 'model' in text_lower or 'cat #' in text_lower:
-        content_type.append("product listings")
-    if 'application' in text_lower or 'use' in text_lower:
-        content_type.append("application details")
-    
+    content_type = [name for bit, name in CONTENT_TYPES if content_mask & bit]
     content_desc = " and ".join(content_type) if content_type else "product information"
     
     summary = f"{section_info}This page includes {content_desc}."
@@ -207,10 +314,8 @@ def process_pdf(pdf_path, page_num):
     section, page_range = get_section_info(page_num)
     
     # Extract components
-    title = extract_title(text, page_num)
-    products = extract_products(text)
-    keywords = extract_keywords(text, title, products)
-    summary = generate_summary(text, title, products)
+    analysis = analyze_page(text, page_num)
+    summary = generate_summary(analysis.products, analysis.summary_hints)
     
     # Create entry
     entry = {
@@ -219,14 +324,41 @@ def process_pdf(pdf_path, page_num):
         "thumbnail": f"thumbnails/page_{page_num:04d}.png",
         "section": section,
         "pageRangeGroup": page_range,
-        "title": title,
-        "products": products,
-        "keywords": keywords,
+        "title": analysis.title,
+        "products": analysis.products,
+        "keywords": analysis.keywords,
         "summary": summary
     }
     
     return entry
 
+def process_pdf_star(args):
+    """Unpack a (page_num, pdf_path) tuple for use with executor.map."""
+    page_num, pdf_path = args
+    return process_pdf(pdf_path, page_num)
+
+def write_json(path, data):
+    """Write data to path as indented UTF-8 JSON."""
+    if orjson is not None:
+        with open(path, 'wb') as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+    else:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+
+def append_ndjson(f, entry):
+    """Append one entry as a line of JSON to a file opened in binary mode."""
+    if orjson is not None:
+        f.write(orjson.dumps(entry) + b"\n")
+    else:
+        f.write(json.dumps(entry, ensure_ascii=False).encode('utf-8') + b"\n")
+
+def read_ndjson(path):
+    """Read back all entries written by append_ndjson."""
+    loads = orjson.loads if orjson is not None else json.loads
+    with open(path, 'rb') as f:
+        return [loads(line) for line in f if line.strip()]
+
 def main():
     """Main processing function."""
     base_dir = Path(__file__).parent
@@ -238,14 +370,11 @@ def main():
     
     # Find all PDF files
     pdf_files = []
-    for section_dir in pdf_dir.iterdir():
-        if section_dir.is_dir():
-            for pdf_file in section_dir.glob("ocr_trim_page_*.pdf"):
-                # Extract page number
-                match = re.search(r'ocr_trim_page_(\d+)\.pdf', pdf_file.name)
-                if match:
-                    page_num = int(match.group(1))
-                    pdf_files.append((page_num, pdf_file))
+    for pdf_file in pdf_dir.rglob("ocr_trim_page_*.pdf"):
+        # Extract page number
+        match = _PAGE_NUM_RE.search(pdf_file.name)
+        if match:
+            pdf_files.append((int(match.group(1)), pdf_file))
     
     # Sort by page number
     pdf_files.sort(key=lambda x: x[0])
@@ -253,14 +382,27 @@ def main():
     print(f"Found {len(pdf_files)} PDF files to process")
     print()
     
-    # Process all PDFs
-    catalog_entries = []
-    section_groups = defaultdict(list)
-    
-    for page_num, pdf_path in pdf_files:
-        entry = process_pdf(pdf_path, page_num)
-        catalog_entries.append(entry)
-        section_groups[entry["section"]].append(page_num)
+    # Process all PDFs in parallel (each page is independent), streaming
+    # entries to NDJSON as they finish instead of holding them in memory
+    ndjson_output = base_dir / "catalog_index.ndjson"
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor, \
+            open(ndjson_output, 'wb') as f:
+        for entry in executor.map(process_pdf_star, pdf_files, chunksize=8):
+            append_ndjson(f, entry)
+    
+    catalog_entries = read_ndjson(ndjson_output)
+    catalog_entries.sort(key=lambda e: e["page"])
+    # Share one string object per section and page range group
+    for entry in catalog_entries:
+        entry["section"] = sys.intern(entry["section"])
+        entry["pageRangeGroup"] = sys.intern(entry["pageRangeGroup"])
+    
+    # Group page numbers by section in a post-pass
+    by_section = sorted(catalog_entries, key=lambda e: (e["section"], e["page"]))
+    section_groups = {
+        section: [e["page"] for e in group]
+        for section, group in groupby(by_section, key=lambda e: e["section"])
+    }
     
     print()
     print("=" * 60)
@@ -268,8 +410,7 @@ def main():
     
     # Save catalog_index.json
     catalog_output = base_dir / "catalog_index.json"
-    with open(catalog_output, 'w', encoding='utf-8') as f:
-        json.dump(catalog_entries, f, indent=2, ensure_ascii=False)
+    write_json(catalog_output, catalog_entries)
     print(f"✓ Created {catalog_output} ({len(catalog_entries)} entries)")
     
     # Generate section_index.json
@@ -282,8 +423,7 @@ def main():
         }
     
     section_output = base_dir / "section_index.json"
-    with open(section_output, 'w', encoding='utf-8') as f:
-        json.dump(section_index, f, indent=2, ensure_ascii=False)
+    write_json(section_output, section_index)
     print(f"✓ Created {section_output} ({len(section_index)} sections)")
     
     print()